@@ -0,0 +1,203 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import interpolation
+import mgm_ilce
+import station_cache
+from hexbin import LAYER_FILE, LAYER_SCRIPT_FILE, TEMPLATE_FILE
+from metrics import METRICS
+from stub_server import StubServer, load_fixtures
+
+
+def percentiles(samples):
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+@contextlib.contextmanager
+def timed_fetch_one(samples):
+    original = mgm_ilce.fetch_one
+
+    def wrapper(province, district):
+        start = time.perf_counter()
+        try:
+            return original(province, district)
+        finally:
+            samples.append(time.perf_counter() - start)
+
+    mgm_ilce.fetch_one = wrapper
+    try:
+        yield
+    finally:
+        mgm_ilce.fetch_one = original
+
+
+def _counts_delta(before, after):
+    return {key: after[key] - before.get(key, 0) for key in after}
+
+
+def _connection_totals():
+    snapshot = METRICS.snapshot()
+    connections = sum(c["value"] for c in snapshot["counters"] if c["name"] == "connections_total")
+    connect_seconds = sum(h["sum"] for h in snapshot["histograms"] if h["name"] == "connect_seconds")
+    return connections, connect_seconds
+
+
+def measure(name, func, stub, setup=None, districts=None, samples=None):
+    # Süre ve bellek ayrı geçişlerde ölçülür; tracemalloc yükü süreye yansımaz
+    if setup:
+        setup()
+    counts = dict(stub.counts)
+    connections, connect_seconds = _connection_totals()
+    start = time.perf_counter()
+    # Ölçüm sırasında her ilçe için basılan satırlar gizlenir
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func()
+    elapsed = time.perf_counter() - start
+    report = {"name": name, "seconds": elapsed, "stub": _counts_delta(counts, dict(stub.counts))}
+    # Yeni bağlantı sayısı ve kurulum süresi; sunucu süresinden ayrı raporlanır
+    connections_after, connect_seconds_after = _connection_totals()
+    report["connections"] = connections_after - connections
+    report["connect_seconds"] = connect_seconds_after - connect_seconds
+    if samples is not None:
+        report.update({f"latency_{k}": v for k, v in percentiles(samples).items()})
+    if districts:
+        report["districts"] = districts
+        report["districts_per_s"] = districts / elapsed
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    report["peak_mb"] = peak / 2 ** 20
+    return report, result
+
+
+def refresh_scenario(name, stub, setup=None):
+    samples = []
+    pairs = sum(len(d) for d in mgm_ilce.get_all_provinces().values())
+
+    def run_refresh():
+        # Gecikme örnekleri yalnızca süre geçişinde toplanır
+        if tracemalloc.is_tracing():
+            return mgm_ilce.fetch_all_weather_data(max_age=0)
+        with timed_fetch_one(samples):
+            return mgm_ilce.fetch_all_weather_data(max_age=0)
+
+    report, df = measure(name, run_refresh, stub, setup, pairs, samples)
+    report["ok"] = int((df["Status"] == "ok").sum())
+    return report, df
+
+
+def _remove(*paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def run(args):
+    fixtures = load_fixtures(args.fixtures) if args.fixtures else None
+    stub = StubServer(fixtures, latency=args.latency, jitter=args.jitter,
+                      error_rate=args.error_rate, rate_limit=args.rate_limit)
+    reports = []
+
+    with tempfile.TemporaryDirectory() as workdir, stub:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        base_url, limiter = mgm_ilce.BASE_URL, mgm_ilce._limiter
+        mgm_ilce.BASE_URL = stub.url
+        mgm_ilce._limiter = mgm_ilce.RateLimiter(args.rps)
+        station_cache._cache = station_cache.StationCache(os.path.join(workdir, "stations.db"))
+        try:
+            def cold():
+                station_cache._cache.clear()
+                _remove(mgm_ilce.CSV_FILE)
+
+            report, _ = refresh_scenario("refresh_cold", stub, cold)
+            reports.append(report)
+            report, df = refresh_scenario("refresh_warm", stub)
+            reports.append(report)
+            report, _ = measure(
+                "render_hexbin", lambda: mgm_ilce.plot_temperature_on_map(df), stub,
+                lambda: _remove(LAYER_FILE, LAYER_SCRIPT_FILE, TEMPLATE_FILE)
+            )
+            reports.append(report)
+            report, _ = measure(
+                f"interpolate_{args.resolution_km:g}km",
+                lambda: interpolation.interpolate_surface(df, resolution_km=args.resolution_km), stub
+            )
+            reports.append(report)
+        finally:
+            mgm_ilce.BASE_URL, mgm_ilce._limiter = base_url, limiter
+            station_cache._cache = None
+            os.chdir(cwd)
+
+    return reports
+
+
+def print_reports(reports):
+    for r in reports:
+        line = f"{r['name']:<20} {r['seconds']:8.2f} s  peak {r['peak_mb']:7.1f} MB"
+        if "districts_per_s" in r:
+            line += (f"  {r['districts_per_s']:7.1f} ilçe/s  p50 {r['latency_p50'] * 1000:6.1f} ms"
+                     f"  p95 {r['latency_p95'] * 1000:6.1f} ms  p99 {r['latency_p99'] * 1000:6.1f} ms")
+        if r["connections"]:
+            line += f"  {r['connections']} bağlantı ({r['connect_seconds'] * 1000:.1f} ms)"
+        print(line)
+
+
+def compare(reports, baseline_path, tolerance):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["name"]: r for r in json.load(f)}
+    regressions = []
+    for r in reports:
+        base = baseline.get(r["name"])
+        if base and r["seconds"] > base["seconds"] * (1 + tolerance):
+            regressions.append(f"{r['name']}: {base['seconds']:.2f} s -> {r['seconds']:.2f} s")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stub sunucu üzerinde uçtan uca performans ölçümü")
+    parser.add_argument("--fixtures", help="record_fixtures ile kaydedilmiş JSON; yoksa sentetik veri")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub yanıt gecikmesi, saniye")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None, help="stub tarafında saniyede istek sınırı")
+    parser.add_argument("--rps", type=float, default=0, help="istemci hız sınırı, 0 = sınırsız")
+    parser.add_argument("--resolution-km", type=float, default=5.0)
+    parser.add_argument("--json", help="sonuçları bu dosyaya yaz")
+    parser.add_argument("--baseline", help="karşılaştırılacak önceki --json çıktısı")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="izin verilen yavaşlama oranı")
+    args = parser.parse_args(argv)
+
+    reports = run(args)
+    print_reports(reports)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+    if args.baseline:
+        regressions = compare(reports, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f"Yavaşlama: {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import bisect
+import difflib
+import os
+import pickle
+import threading
+import zlib
+from array import array
+
+import ilceler
+
+INDEX_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "district_index.pkl")
+INDEX_VERSION = 2
+
+UPPER_REPLACEMENTS = {"İ": "i", "I": "ı", "Ü": "ü", "Ğ": "ğ", "Ş": "ş", "Ö": "ö", "Ç": "ç"}
+REPLACEMENTS = {"ı": "i", "ü": "u", "ğ": "g", "ş": "s", "ö": "o", "ç": "c", "̇": ""}
+
+
+def clear_tr_character(name):
+    for tr_char, lower_char in UPPER_REPLACEMENTS.items():
+        name = name.replace(tr_char, lower_char)
+    name = name.lower()
+    for tr_char, lat_char in REPLACEMENTS.items():
+        name = name.replace(tr_char, lat_char)
+    return " ".join(name.split())
+
+
+def _turkish_chars(name):
+    return sum(ord(c) > 127 for c in name)
+
+
+def district_id(province, district):
+    return zlib.crc32(f"{province}/{district}".encode("utf-8"))
+
+
+class DistrictIndex:
+    __slots__ = ("keys", "ids", "names", "provinces", "province_names", "_by_id")
+
+    def __init__(self, keys, ids, names, provinces, province_names):
+        self.keys = keys
+        self.ids = ids
+        self.names = names
+        self.provinces = provinces
+        self.province_names = province_names
+        self._by_id = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _position(self, key):
+        pos = bisect.bisect_left(self.keys, key)
+        if pos < len(self.keys) and self.keys[pos] == key:
+            return pos
+        return None
+
+    def get(self, province, district):
+        pos = self._position(f"{clear_tr_character(province)}/{clear_tr_character(district)}")
+        return None if pos is None else self.ids[pos]
+
+    def label(self, province, district):
+        # Gösterim için ilceler.py'deki Türkçe yazım, sorgular için normalize anahtar kullanılır
+        province_key = clear_tr_character(province)
+        pos = self._position(f"{province_key}/{clear_tr_character(district)}")
+        province_name = self.province_names.get(province_key, province)
+        district_name = self.names[pos] if pos is not None else district
+        return province_name.title(), district_name.title()
+
+    def lookup_id(self, id_):
+        if self._by_id is None:
+            self._by_id = {id_: pos for pos, id_ in enumerate(self.ids)}
+        pos = self._by_id.get(id_)
+        if pos is None:
+            return None
+        province, district = self.keys[pos].split("/", 1)
+        return province, district
+
+    def pairs(self):
+        return [tuple(key.split("/", 1)) for key in self.keys]
+
+    def districts(self, province):
+        prefix = clear_tr_character(province) + "/"
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + "￿")
+        return [key[len(prefix):] for key in self.keys[start:end]]
+
+    def as_dict(self):
+        grouped = {}
+        for province, district in self.pairs():
+            grouped.setdefault(province, []).append(district)
+        return grouped
+
+    def prefix(self, text, province=None):
+        text = clear_tr_character(text)
+        if province is not None:
+            return [d for d in self.districts(province) if d.startswith(text)]
+        return [tuple(key.split("/", 1)) for key in self.keys if key.split("/", 1)[1].startswith(text)]
+
+    def fuzzy(self, text, province=None, n=5, cutoff=0.75):
+        text = clear_tr_character(text)
+        if province is not None:
+            return difflib.get_close_matches(text, self.districts(province), n=n, cutoff=cutoff)
+        names = {}
+        for province_name, district in self.pairs():
+            names.setdefault(district, []).append(province_name)
+        matches = difflib.get_close_matches(text, list(names), n=n, cutoff=cutoff)
+        return [(province_name, match) for match in matches for province_name in names[match]]
+
+
+def build_index(provinces=None):
+    if provinces is None:
+        provinces = ilceler.get_all_provinces_with_districts()
+
+    names = {}
+    province_names = {}
+    for province, districts in provinces.items():
+        province_key = clear_tr_character(province)
+        if _turkish_chars(province) > _turkish_chars(province_names.get(province_key, "")):
+            province_names[province_key] = province.strip()
+        province_names.setdefault(province_key, province.strip())
+        for district in districts:
+            key = f"{province_key}/{clear_tr_character(district)}"
+            # Aynı yerin ASCII ve Türkçe yazımlarından Türkçe olanı gösterim adı olarak tutulur
+            if _turkish_chars(district) > _turkish_chars(names.get(key, "")):
+                names[key] = district.strip()
+            names.setdefault(key, district.strip())
+
+    keys = sorted(names)
+    ids = array("I", (district_id(*key.split("/", 1)) for key in keys))
+    if len(set(ids)) != len(ids):
+        raise ValueError("District ID collision in index")
+    provinces_sorted = sorted({key.split("/", 1)[0] for key in keys})
+    return DistrictIndex(keys, ids, [names[key] for key in keys], provinces_sorted, province_names)
+
+
+def write_index(index, path=INDEX_FILE):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump((INDEX_VERSION, index.keys, index.ids, index.names, index.provinces, index.province_names), f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def read_index(path=INDEX_FILE):
+    with open(path, "rb") as f:
+        data = pickle.load(f)
+    if data[0] != INDEX_VERSION:
+        raise ValueError(f"Unsupported index version {data[0]}")
+    return DistrictIndex(*data[1:])
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def load_index(path=INDEX_FILE):
+    global _index
+    with _index_lock:
+        if _index is None:
+            source = ilceler.__file__
+            if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(source):
+                try:
+                    _index = read_index(path)
+                except (OSError, ValueError, pickle.UnpicklingError):
+                    _index = None
+            if _index is None:
+                _index = build_index()
+                try:
+                    write_index(_index, path)
+                except OSError as exc:
+                    print(f"İndeks dosyası yazılamadı: {exc}")
+        return _index
+
+
+if __name__ == "__main__":
+    index = build_index()
+    write_index(index)
+    print(f"{len(index)} ilçe, {len(index.provinces)} il indekslendi: {INDEX_FILE}")
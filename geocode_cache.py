@@ -0,0 +1,79 @@
+import os
+import sqlite3
+import threading
+import time
+
+from district_index import clear_tr_character
+from station_cache import get_station_cache
+
+GEOCODE_DB = os.environ.get("MGM_GEOCODE_DB", "geocode.db")
+GEOCODE_INTERVAL = 1.0  # Nominatim kullanım koşulları: saniyede en fazla bir istek
+
+
+class GeocodeCache:
+    def __init__(self, path=GEOCODE_DB):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocodes ("
+            "sehir TEXT NOT NULL, ilce TEXT NOT NULL, latitude REAL, longitude REAL, "
+            "source TEXT, PRIMARY KEY (sehir, ilce))"
+        )
+        self.conn.commit()
+
+    def get(self, sehir, ilce):
+        sehir = clear_tr_character(sehir)
+        ilce = clear_tr_character(ilce or "")
+        # "Merkez" ilçesi için il merkezinin istasyon kaydı da kullanılabilir
+        keys = [(sehir, ilce), (sehir, "")] if ilce == "merkez" else [(sehir, ilce)]
+        with self.lock:
+            for key in keys:
+                row = self.conn.execute(
+                    "SELECT latitude, longitude FROM geocodes WHERE sehir = ? AND ilce = ?", key
+                ).fetchone()
+                if row is not None:
+                    return row
+        return None
+
+    def put(self, sehir, ilce, latitude, longitude, source):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?, ?)",
+                (clear_tr_character(sehir), clear_tr_character(ilce or ""), latitude, longitude, source)
+            )
+            self.conn.commit()
+
+    def seed_from_stations(self, station_cache=None):
+        station_cache = station_cache or get_station_cache()
+        rows = [
+            (il, ilce, record.get("enlem"), record.get("boylam"), "mgm")
+            for il, ilce, record in station_cache.items()
+            if record.get("enlem") is not None and record.get("boylam") is not None
+        ]
+        with self.lock:
+            # Geocoder'dan gelenleri değil, yalnızca eksik kayıtları doldur
+            self.conn.executemany("INSERT OR IGNORE INTO geocodes VALUES (?, ?, ?, ?, ?)", rows)
+            self.conn.commit()
+        return len(rows)
+
+
+def resolve_coordinates(pairs, geolocator=None, cache=None):
+    cache = cache or GeocodeCache()
+    resolved = {}
+    last_call = 0.0
+
+    for sehir, ilce in pairs:
+        row = cache.get(sehir, ilce)
+        if row is None and geolocator is not None:
+            wait = GEOCODE_INTERVAL - (time.monotonic() - last_call)
+            if wait > 0:
+                time.sleep(wait)
+            location = geolocator.geocode(f"{ilce}, {sehir}, Türkiye")
+            last_call = time.monotonic()
+            row = (location.latitude, location.longitude) if location else (None, None)
+            # Bulunamayanlar da kaydedilir, böylece tekrar sorgulanmazlar
+            cache.put(sehir, ilce, row[0], row[1], "nominatim")
+        resolved[(sehir, ilce)] = row if row is not None else (None, None)
+
+    return resolved
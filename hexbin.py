@@ -0,0 +1,251 @@
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+HEX_SIZE = 0.25  # Derece cinsinden altıgen yarıçapı
+REFERENCE_LAT = 39.0  # Türkiye'nin orta enlemi; hücre kimlikleri verilerden bağımsız kalsın diye sabit
+AGGREGATES = ("mean", "min", "max", "count")
+LAYER_FILE = "map_layer.json"
+LAYER_SCRIPT_FILE = "map_layer.js"  # file:// ile açılan sayfa fetch kullanamadığı için aynı katmanın script kopyası
+TEMPLATE_FILE = "map.html"
+
+_KEY_OFFSET = 1 << 20
+_SQRT3 = math.sqrt(3.0)
+
+
+def hex_cells(lat, lon, size=HEX_SIZE):
+    x = np.asarray(lon, dtype=np.float64) * math.cos(math.radians(REFERENCE_LAT))
+    y = np.asarray(lat, dtype=np.float64)
+
+    # Sivri tepeli altıgenler için eksenel koordinatlar, ardından küp yuvarlama
+    qf = (_SQRT3 / 3.0 * x - y / 3.0) / size
+    rf = (2.0 / 3.0 * y) / size
+    sf = -qf - rf
+    q, r, s = np.rint(qf), np.rint(rf), np.rint(sf)
+    dq, dr, ds = np.abs(q - qf), np.abs(r - rf), np.abs(s - sf)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    q = np.where(fix_q, -r - s, q)
+    r = np.where(fix_r, -q - s, r)
+    return q.astype(np.int64), r.astype(np.int64)
+
+
+def cell_keys(q, r):
+    return (q + _KEY_OFFSET) * (2 * _KEY_OFFSET) + (r + _KEY_OFFSET)
+
+
+def split_keys(keys):
+    return keys // (2 * _KEY_OFFSET) - _KEY_OFFSET, keys % (2 * _KEY_OFFSET) - _KEY_OFFSET
+
+
+def cell_centers(q, r, size=HEX_SIZE):
+    x = size * _SQRT3 * (q + r / 2.0)
+    y = size * 1.5 * r
+    return y, x / math.cos(math.radians(REFERENCE_LAT))
+
+
+def aggregate(inverse, values, n_cells, aggregates=AGGREGATES):
+    counts = np.bincount(inverse, minlength=n_cells)
+    result = {}
+    if "count" in aggregates:
+        result["count"] = counts
+    if "mean" in aggregates:
+        sums = np.bincount(inverse, weights=values, minlength=n_cells)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result["mean"] = sums / counts
+    if "min" in aggregates:
+        mins = np.full(n_cells, np.inf)
+        np.minimum.at(mins, inverse, values)
+        result["min"] = mins
+    if "max" in aggregates:
+        maxs = np.full(n_cells, -np.inf)
+        np.maximum.at(maxs, inverse, values)
+        result["max"] = maxs
+    return result
+
+
+def _point_hashes(lat, lon, values):
+    hashes = pd.util.hash_array(np.asarray(lat, dtype=np.float64))
+    hashes ^= pd.util.hash_array(np.asarray(lon, dtype=np.float64)) * np.uint64(0x9E3779B97F4A7C15)
+    hashes ^= pd.util.hash_array(np.asarray(values, dtype=np.float64)) * np.uint64(0xC2B2AE3D27D4EB4F)
+    return hashes
+
+
+class HexLayer:
+    def __init__(self, size=HEX_SIZE, aggregates=AGGREGATES):
+        self.size = size
+        self.aggregates = tuple(aggregates)
+        self.cells = {}  # hücre anahtarı -> (imza, {toplama: değer})
+        self.changed = []
+
+    def update(self, lat, lon, values):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        valid = np.isfinite(lat) & np.isfinite(lon) & np.isfinite(values)
+        lat, lon, values = lat[valid], lon[valid], values[valid]
+
+        keys, inverse = np.unique(cell_keys(*hex_cells(lat, lon, self.size)), return_inverse=True)
+
+        # Hücre imzası: içindeki noktaların karmalarının toplamı (sıradan bağımsız)
+        order = np.argsort(inverse, kind="stable")
+        starts = np.searchsorted(inverse[order], np.arange(len(keys)))
+        hashes = _point_hashes(lat, lon, values)[order]
+        signatures = np.add.reduceat(hashes, starts) if len(keys) else np.empty(0, dtype=np.uint64)
+
+        previous = self.cells
+        changed = np.array(
+            [previous.get(int(k), (None,))[0] != int(sig) for k, sig in zip(keys, signatures)], dtype=bool
+        )
+
+        cells = {}
+        if changed.any():
+            # Yalnızca girdisi değişen hücreler yeniden toplanır
+            changed_idx = np.flatnonzero(changed)
+            remap = np.full(len(keys), -1)
+            remap[changed_idx] = np.arange(len(changed_idx))
+            mask = changed[inverse]
+            stats = aggregate(remap[inverse[mask]], values[mask], len(changed_idx), self.aggregates)
+            for i, idx in enumerate(changed_idx):
+                cells[int(keys[idx])] = (int(signatures[idx]), {name: float(stats[name][i]) for name in self.aggregates})
+        for idx in np.flatnonzero(~changed):
+            cells[int(keys[idx])] = previous[int(keys[idx])]
+
+        self.changed = [int(keys[idx]) for idx in np.flatnonzero(changed)]
+        self.changed += [key for key in previous if key not in cells]
+        self.cells = cells
+        return self
+
+    def frame(self):
+        keys = np.fromiter(self.cells, dtype=np.int64, count=len(self.cells))
+        q, r = split_keys(keys)
+        lat, lon = cell_centers(q, r, self.size)
+        df = pd.DataFrame({"q": q, "r": r, "Latitude": lat, "Longitude": lon})
+        for name in self.aggregates:
+            df[name] = [self.cells[int(k)][1][name] for k in keys]
+        return df
+
+    def to_json(self):
+        keys = list(self.cells)
+        q, r = split_keys(np.array(keys, dtype=np.int64))
+        return {
+            "size": self.size,
+            "lat0": REFERENCE_LAT,
+            "aggregates": list(self.aggregates),
+            "cells": [
+                [int(qi), int(ri), str(self.cells[k][0])] + [round(self.cells[k][1][name], 2) for name in self.aggregates]
+                for k, qi, ri in zip(keys, q, r)
+            ],
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        layer = cls(data["size"], data["aggregates"])
+        if data.get("lat0") != REFERENCE_LAT:
+            return layer
+        for cell in data["cells"]:
+            key = int(cell_keys(np.int64(cell[0]), np.int64(cell[1])))
+            layer.cells[key] = (int(cell[2]), dict(zip(layer.aggregates, cell[3:])))
+        return layer
+
+
+def load_layer(path=LAYER_FILE, size=HEX_SIZE, aggregates=AGGREGATES):
+    if os.path.exists(path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                layer = HexLayer.from_json(json.load(f))
+            if layer.size == size and layer.aggregates == tuple(aggregates):
+                return layer
+        except (OSError, ValueError, KeyError):
+            pass
+    return HexLayer(size, aggregates)
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def write_layer(layer, path=LAYER_FILE, script_path=LAYER_SCRIPT_FILE, **meta):
+    data = layer.to_json()
+    data.update(meta)
+    text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    _write_atomic(path, text)
+    if script_path:
+        _write_atomic(script_path, f"window.MAP_LAYER = {text};\n")
+
+
+def render_template(layer_url=LAYER_FILE, script_url=LAYER_SCRIPT_FILE):
+    return TEMPLATE.replace("__LAYER_URL__", layer_url).replace("__LAYER_SCRIPT__", script_url)
+
+
+def write_template(path=TEMPLATE_FILE, layer_url=LAYER_FILE, script_url=LAYER_SCRIPT_FILE):
+    html = render_template(layer_url, script_url)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            if f.read() == html:
+                return False
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(html)
+    return True
+
+
+TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>MGM Harita</title>
+<script src="https://cdn.plot.ly/plotly-2.35.2.min.js"></script>
+<style>html, body, #map { margin: 0; height: 100%; } #controls { position: absolute; top: 8px; left: 8px; z-index: 10; }</style>
+</head>
+<body>
+<div id="controls"><select id="aggregate"></select></div>
+<div id="map"></div>
+<script>
+// HTTP üzerinden katman JSON'u fetch ile, diskten (file://) açıldığında ise script kopyası ile yüklenir
+const loadLayer = () => location.protocol === "file:"
+  ? new Promise((resolve, reject) => {
+      const script = document.createElement("script");
+      script.src = "__LAYER_SCRIPT__?t=" + Date.now();
+      script.onload = () => resolve(window.MAP_LAYER);
+      script.onerror = reject;
+      document.head.appendChild(script);
+    })
+  : fetch("__LAYER_URL__", {cache: "no-store"}).then(r => r.json());
+loadLayer().then(layer => {
+  const c = Math.cos(layer.lat0 * Math.PI / 180), s = layer.size, features = [], ids = [];
+  layer.cells.forEach(cell => {
+    const x = s * Math.sqrt(3) * (cell[0] + cell[1] / 2), y = s * 1.5 * cell[1], ring = [];
+    for (let i = 0; i <= 6; i++) {
+      const a = Math.PI / 180 * (60 * i - 30);
+      ring.push([(x + s * Math.cos(a)) / c, y + s * Math.sin(a)]);
+    }
+    const id = cell[0] + "," + cell[1];
+    ids.push(id);
+    features.push({type: "Feature", id: id, geometry: {type: "Polygon", coordinates: [ring]}});
+  });
+  const select = document.getElementById("aggregate");
+  layer.aggregates.forEach(name => select.add(new Option(name, name)));
+  const draw = () => {
+    const i = 3 + layer.aggregates.indexOf(select.value);
+    Plotly.react("map", [{
+      type: "choroplethmapbox", geojson: {type: "FeatureCollection", features: features},
+      locations: ids, z: layer.cells.map(cell => cell[i]), colorscale: "YlOrRd", marker: {opacity: 0.6},
+      colorbar: {title: (layer.label || "") + " (" + select.value + ")"}
+    }], {
+      mapbox: {style: "carto-positron", zoom: 5, center: layer.center || {lat: 39, lon: 35}},
+      margin: {r: 0, t: 0, l: 0, b: 0}
+    });
+  };
+  select.onchange = draw;
+  draw();
+});
+</script>
+</body>
+</html>
+"""
@@ -0,0 +1,229 @@
+import functools
+import operator
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from district_index import clear_tr_character
+from observation import CATEGORY_COLUMNS, FLOAT_COLUMNS
+
+HISTORY_DIR = os.environ.get("MGM_HISTORY_DIR", "history")
+KEY_COLUMNS = ["Province", "District"]
+VALUE_COLUMNS = ["Latitude", "Longitude", "Elevation"] + FLOAT_COLUMNS
+STORED_COLUMNS = KEY_COLUMNS + ["FetchedAt", "StationId", "ObservedAt"] + sorted(CATEGORY_COLUMNS) + VALUE_COLUMNS
+# Yazım anında saklanan normalize il/ilçe anahtarları; filtreler parquet okuyucusuna bu sütunlar üzerinden iner
+NORMALIZED_COLUMNS = ["ProvinceKey", "DistrictKey"]
+COMPACTED_PREFIX = "compacted-"
+ROW_GROUP_SIZE = 8192  # Sıralı birleştirilmiş dosyada küçük satır grupları il/ilçe istatistikleriyle atlanır
+
+_TIMESTAMP = pa.timestamp("s", tz="UTC")
+READ_SCHEMA = pa.schema(
+    [(c, pa.string()) for c in KEY_COLUMNS + NORMALIZED_COLUMNS]
+    + [("FetchedAt", _TIMESTAMP), ("StationId", pa.int32()), ("ObservedAt", _TIMESTAMP)]
+    + [(c, pa.string()) for c in sorted(CATEGORY_COLUMNS)]
+    + [(c, pa.float32()) for c in VALUE_COLUMNS]
+)
+
+
+def _utc(value):
+    value = pd.Timestamp(value)
+    return value.tz_localize("UTC") if value.tzinfo is None else value.tz_convert("UTC")
+
+
+def _empty_frame(columns):
+    dtypes = {column: "category" for column in KEY_COLUMNS + sorted(CATEGORY_COLUMNS)}
+    dtypes.update({"FetchedAt": "datetime64[s, UTC]", "ObservedAt": "datetime64[s, UTC]", "StationId": np.int32})
+    return pd.DataFrame({column: pd.Series(dtype=dtypes.get(column, np.float32)) for column in columns})
+
+
+def _matches(series, value):
+    # Eski parçalarda ASCII, yenilerinde Türkçe yazım olabilir; karşılaştırma normalize anahtarla yapılır
+    target = clear_tr_character(value)
+    categories = series.cat.categories if isinstance(series.dtype, pd.CategoricalDtype) else series.unique()
+    return series.isin([name for name in categories if clear_tr_character(str(name)) == target])
+
+
+def _normalized(series):
+    # Her farklı ad bir kez normalize edilir. Kategorik değil düz metin saklanır: pyarrow sözlük
+    # sütunlarının satır grubu istatistikleriyle budama yapamıyor
+    series = series.astype("category")
+    return series.map({name: clear_tr_character(str(name)) for name in series.cat.categories}).astype(str)
+
+
+def _partition_dir(root, day):
+    return os.path.join(root, f"date={day:%Y-%m-%d}")
+
+
+def _part_ns(name):
+    # part-<ns>.parquet / compacted-<ns>.parquet; ns, dosyanın kapsadığı en son parçanın zaman damgasıdır
+    return int(name.rsplit("-", 1)[1].split(".", 1)[0])
+
+
+def _write_parquet(frame, path, **kwargs):
+    tmp_path = path + ".tmp"
+    frame.reset_index(drop=True).to_parquet(tmp_path, index=False, **kwargs)
+    os.replace(tmp_path, path)
+
+
+def compact_frame(df):
+    out = pd.DataFrame({
+        "Province": df["Province"].astype("category"),
+        "District": df["District"].astype("category"),
+        "ProvinceKey": _normalized(df["Province"]),
+        "DistrictKey": _normalized(df["District"]),
+        "FetchedAt": pd.to_datetime(df["FetchedAt"], unit="s", utc=True).astype("datetime64[s, UTC]"),
+    })
+    if "StationId" in df.columns:
+        out["StationId"] = pd.to_numeric(df["StationId"], errors="coerce").fillna(-1).astype(np.int32)
+    if "ObservedAt" in df.columns:
+        out["ObservedAt"] = pd.to_datetime(df["ObservedAt"], utc=True, errors="coerce").astype("datetime64[s, UTC]")
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns:
+            out[column] = df[column].astype("category")
+    # Eski anlık görüntülerde bulunmayan ölçüm sütunları atlanır
+    for column in VALUE_COLUMNS:
+        if column in df.columns:
+            out[column] = pd.to_numeric(df[column], errors="coerce").astype(np.float32)
+    return out
+
+
+def append(df, root=HISTORY_DIR):
+    if "Status" in df.columns:
+        df = df[df["Status"] == "ok"]
+    if df.empty:
+        return 0
+
+    frame = compact_frame(df)
+    days = frame["FetchedAt"].dt.floor("D")
+    for day, part in frame.groupby(days, observed=True):
+        directory = _partition_dir(root, day)
+        os.makedirs(directory, exist_ok=True)
+        # Her yazım yeni bir parça dosyası oluşturur, var olan dosyalara dokunulmaz
+        _write_parquet(part, os.path.join(directory, f"part-{time.time_ns()}.parquet"))
+    return len(frame)
+
+
+def _partition_files(directory):
+    names = [f for f in os.listdir(directory) if f.endswith(".parquet")]
+    compacted = max((f for f in names if f.startswith(COMPACTED_PREFIX)), key=_part_ns, default=None)
+    covered = _part_ns(compacted) if compacted else -1
+    # Birleştirilmiş dosyanın kapsadığı parçalar (silinmeden önce kesilen bir birleştirmeden kalanlar) atlanır
+    parts = sorted((f for f in names if f.startswith("part-") and _part_ns(f) > covered), key=_part_ns)
+    return ([compacted] if compacted else []) + parts
+
+
+def partitions(root=HISTORY_DIR, start=None, end=None):
+    if not os.path.isdir(root):
+        return []
+    start_day = _utc(start).normalize() if start is not None else None
+    end_day = _utc(end).normalize() if end is not None else None
+
+    selected = []
+    for name in sorted(os.listdir(root)):
+        if not name.startswith("date="):
+            continue
+        day = pd.Timestamp(name[len("date="):], tz="UTC")
+        if (start_day is not None and day < start_day) or (end_day is not None and day > end_day):
+            continue
+        directory = os.path.join(root, name)
+        selected.extend(os.path.join(directory, f) for f in _partition_files(directory))
+    return selected
+
+
+def _read_table(files, columns, filter=None):
+    # Eski parçalarda bulunmayan sütunlar READ_SCHEMA sayesinde boş (null) okunur
+    dataset = ds.dataset(files, schema=READ_SCHEMA, format="parquet")
+    return dataset.to_table(columns=columns, filter=filter)
+
+
+def compact(root=HISTORY_DIR, before=None):
+    # Tamamlanmış (bugünden önceki) her gün tek, il/ilçe sıralı bir dosyada birleştirilir
+    if not os.path.isdir(root):
+        return 0
+    before = _utc(before if before is not None else datetime.now(timezone.utc)).normalize()
+    compacted = 0
+    for name in sorted(os.listdir(root)):
+        if not name.startswith("date=") or pd.Timestamp(name[len("date="):], tz="UTC") >= before:
+            continue
+        directory = os.path.join(root, name)
+        files = _partition_files(directory)
+        if len(files) == 1 and files[0].startswith(COMPACTED_PREFIX):
+            continue
+
+        frame = _read_table([os.path.join(directory, f) for f in files], STORED_COLUMNS + NORMALIZED_COLUMNS).to_pandas()
+        # Normalize anahtarı olmadan yazılmış eski parçalar için anahtar burada hesaplanır
+        for key, column in zip(NORMALIZED_COLUMNS, KEY_COLUMNS):
+            missing = frame[key].isna()
+            if missing.any():
+                frame.loc[missing, key] = _normalized(frame.loc[missing, column])
+        frame["StationId"] = frame["StationId"].fillna(-1).astype(np.int32)
+        for column in KEY_COLUMNS + sorted(CATEGORY_COLUMNS):
+            frame[column] = frame[column].astype("category")
+        frame = frame.sort_values(NORMALIZED_COLUMNS + ["FetchedAt"], kind="stable")
+
+        covered = max(_part_ns(f) for f in files)
+        target = f"{COMPACTED_PREFIX}{covered}.parquet"
+        _write_parquet(frame, os.path.join(directory, target), row_group_size=ROW_GROUP_SIZE)
+        # Yeni dosya yerine konduktan sonra kapsadığı parçalar silinir; arada kesilirse okuma yine doğrudur
+        for f in os.listdir(directory):
+            if f.endswith(".parquet") and f != target and _part_ns(f) <= covered:
+                os.remove(os.path.join(directory, f))
+        compacted += 1
+    return compacted
+
+
+def query(start=None, end=None, province=None, district=None, columns=None, root=HISTORY_DIR):
+    files = partitions(root, start, end)
+    read_columns = None if columns is None else list(dict.fromkeys(KEY_COLUMNS + ["FetchedAt"] + list(columns)))
+
+    wanted = read_columns or STORED_COLUMNS
+    if not files:
+        return _empty_frame(wanted)
+
+    # Zaman ve il/ilçe filtreleri parquet okuyucusuna iner; eşleşmeyen satır grupları hiç okunmaz
+    terms = []
+    if start is not None:
+        terms.append(ds.field("FetchedAt") >= pa.scalar(_utc(start), type=_TIMESTAMP))
+    if end is not None:
+        terms.append(ds.field("FetchedAt") <= pa.scalar(_utc(end), type=_TIMESTAMP))
+    legacy = []
+    for key, column, value in zip(NORMALIZED_COLUMNS, KEY_COLUMNS, (province, district)):
+        if value is not None:
+            # Anahtar sütunu olmayan eski parçaların satırları okunur, aşağıda pandas'ta süzülür
+            terms.append((ds.field(key) == clear_tr_character(value)) | ds.field(key).is_null())
+            legacy.append((key, column, value))
+
+    expression = functools.reduce(operator.and_, terms) if terms else None
+    read = list(dict.fromkeys(wanted + [key for key, _, _ in legacy]))
+    df = _read_table(files, read, expression).to_pandas()
+    for key, column, value in legacy:
+        missing = df[key].isna()
+        if missing.any():
+            df = df[~missing | _matches(df[column], value)]
+    df = df[wanted]
+    if df.empty:
+        return _empty_frame(wanted)
+    if "StationId" in df.columns:
+        # Eksik istasyon numarası, to_columns'daki gibi -1 ile gösterilir
+        df["StationId"] = df["StationId"].fillna(-1).astype(np.int32)
+    for column in KEY_COLUMNS + sorted(CATEGORY_COLUMNS):
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+    for column in ("FetchedAt", "ObservedAt"):
+        if column in df.columns:
+            df[column] = df[column].astype("datetime64[s, UTC]")
+    return df.sort_values("FetchedAt", ignore_index=True)
+
+
+def latest_snapshot(at=None, lookback_days=1, root=HISTORY_DIR):
+    at = _utc(at if at is not None else datetime.now(timezone.utc))
+    df = query(start=at - timedelta(days=lookback_days), end=at, root=root)
+    if df.empty:
+        return df
+    # Her ilçe için verilen ana kadar olan en son gözlem
+    return df.groupby(KEY_COLUMNS, observed=True, sort=False).tail(1).reset_index(drop=True)
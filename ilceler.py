@@ -1,5 +1,4 @@
 def get_all_provinces_with_districts():
-    def get_all_provinces():
     return {
         "adana": [
             "aladağ",
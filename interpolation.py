@@ -0,0 +1,128 @@
+import math
+import time
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+# Türkiye'yi kapsayan sınır kutusu (enlem, boylam)
+TURKEY_BOUNDS = (35.8, 42.2, 25.6, 44.9)
+REFERENCE_LAT = 39.0
+KM_PER_DEGREE = 111.32
+LAPSE_RATE = 0.0065  # °C/m, standart atmosfer sıcaklık azalma oranı
+CHUNK_SIZE = 250_000  # Tek seferde işlenen grid noktası; bellek kullanımını sınırlar
+
+
+def _project(lat, lon):
+    # Küçük bir bölge için eşdikdörtgen izdüşüm yeterli; mesafeler km cinsinden
+    x = np.asarray(lon, dtype=np.float64) * KM_PER_DEGREE * math.cos(math.radians(REFERENCE_LAT))
+    y = np.asarray(lat, dtype=np.float64) * KM_PER_DEGREE
+    return np.column_stack((x, y))
+
+
+def grid_axes(resolution_km=10.0, bounds=TURKEY_BOUNDS):
+    lat_min, lat_max, lon_min, lon_max = bounds
+    lat_step = resolution_km / KM_PER_DEGREE
+    lon_step = resolution_km / (KM_PER_DEGREE * math.cos(math.radians(REFERENCE_LAT)))
+    lats = np.arange(lat_min, lat_max + lat_step / 2, lat_step)
+    lons = np.arange(lon_min, lon_max + lon_step / 2, lon_step)
+    return lats, lons
+
+
+def idw(lat, lon, values, grid_lat, grid_lon, k=8, power=2.0, max_distance_km=np.inf,
+        elevations=None, grid_elevations=None, lapse_rate=LAPSE_RATE, chunk_size=CHUNK_SIZE):
+    if (elevations is None) != (grid_elevations is None):
+        # Deniz seviyesine indirgenen değerler grid yüksekliğiyle geri düzeltilmezse sonuç kayar
+        raise ValueError("elevations and grid_elevations must be given together")
+
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    valid = np.isfinite(lat) & np.isfinite(lon) & np.isfinite(values)
+    if elevations is not None:
+        elevations = np.asarray(elevations, dtype=np.float64)
+        valid &= np.isfinite(elevations)
+        # İstasyon değerleri deniz seviyesine indirgenir, grid yüksekliğinde geri eklenir
+        values = values + lapse_rate * elevations
+    lat, lon, values = lat[valid], lon[valid], values[valid]
+
+    grid_lat = np.asarray(grid_lat, dtype=np.float64)
+    grid_lon = np.asarray(grid_lon, dtype=np.float64)
+    shape = np.broadcast_shapes(grid_lat.shape, grid_lon.shape)
+    out = np.full(int(np.prod(shape)), np.nan, dtype=np.float32)
+    if len(values) == 0:
+        return out.reshape(shape)
+
+    k = min(k, len(values))
+    tree = cKDTree(_project(lat, lon))
+    flat_lat = np.broadcast_to(grid_lat, shape).ravel()
+    flat_lon = np.broadcast_to(grid_lon, shape).ravel()
+    flat_elev = None
+    if grid_elevations is not None:
+        flat_elev = np.broadcast_to(np.asarray(grid_elevations, dtype=np.float64), shape).ravel()
+
+    for start in range(0, len(out), chunk_size):
+        stop = min(start + chunk_size, len(out))
+        distances, indices = tree.query(
+            _project(flat_lat[start:stop], flat_lon[start:stop]), k=k,
+            distance_upper_bound=max_distance_km, workers=-1
+        )
+        if k == 1:
+            distances, indices = distances[:, None], indices[:, None]
+        found = np.isfinite(distances)
+        neighbour_values = values[np.where(found, indices, 0)]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weights = np.where(found, 1.0 / np.power(distances, power), 0.0)
+        exact = distances == 0
+        # Grid noktası bir istasyonla çakışıyorsa istasyon değeri doğrudan alınır
+        exact_rows = exact.any(axis=1)
+        weights[exact_rows] = exact[exact_rows]
+
+        with np.errstate(invalid="ignore"):
+            chunk = (weights * neighbour_values).sum(axis=1) / weights.sum(axis=1)
+        if flat_elev is not None:
+            chunk -= lapse_rate * flat_elev[start:stop]
+        out[start:stop] = chunk
+    return out.reshape(shape)
+
+
+def interpolate_surface(df, column="Temperature", resolution_km=10.0, bounds=TURKEY_BOUNDS,
+                        grid_elevations=None, **kwargs):
+    # grid_elevations: grid_axes(resolution_km, bounds) ile aynı (enlem, boylam) şekline yeniden
+    # örneklenmiş bir sayısal yükseklik modeli (ör. SRTM / Copernicus DEM), metre cinsinden.
+    # Verilirse istasyon yükseklikleri fetch_many'nin Elevation sütunundan alınır.
+    required = ["Latitude", "Longitude", column] + (["Elevation"] if grid_elevations is not None else [])
+    df = df.dropna(subset=required)
+    lats, lons = grid_axes(resolution_km, bounds)
+    if grid_elevations is not None:
+        kwargs.update(elevations=df["Elevation"], grid_elevations=grid_elevations)
+    surface = idw(
+        df["Latitude"], df["Longitude"], df[column],
+        lats[:, None], lons[None, :], **kwargs
+    )
+    return lats, lons, surface
+
+
+def save_surface(path, lats, lons, surface, column="Temperature"):
+    np.savez_compressed(path, lats=lats.astype(np.float32), lons=lons.astype(np.float32),
+                        surface=surface, column=column)
+
+
+def benchmark(n_stations=1000, resolution_km=1.0, k=8, seed=0):
+    rng = np.random.default_rng(seed)
+    lat_min, lat_max, lon_min, lon_max = TURKEY_BOUNDS
+    lat = rng.uniform(lat_min, lat_max, n_stations)
+    lon = rng.uniform(lon_min, lon_max, n_stations)
+    values = rng.uniform(0, 35, n_stations)
+    lats, lons = grid_axes(resolution_km)
+
+    start = time.perf_counter()
+    surface = idw(lat, lon, values, lats[:, None], lons[None, :], k=k)
+    elapsed = time.perf_counter() - start
+    print(f"{n_stations} istasyon, {resolution_km} km grid ({surface.shape[0]}x{surface.shape[1]} = "
+          f"{surface.size:,} hücre), k={k}: {elapsed:.2f} s")
+    return elapsed
+
+
+if __name__ == "__main__":
+    benchmark()
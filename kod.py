@@ -1,33 +1,32 @@
 import pandas as pd
 from geopy.geocoders import Nominatim
 import plotly.express as px
-import time
+from geocode_cache import GeocodeCache, resolve_coordinates
+from port_ingest import read_ports
 
 # Geocoder'ı başlat
 geolocator = Nominatim(user_agent="geoapiExercises")
 
-# CSV dosyasını oku
-df = pd.read_csv("ports_and_details.csv")
+# Dosyadaki tarihler ("06 Eylül") yıl içermez, ilk satırın yılı burada verilir
+ARCHIVE_YEAR = 2024
+
+# CSV dosyasını parça parça, sıkıştırılmış tiplerle oku
+df = read_ports("ports_and_details.csv", ARCHIVE_YEAR)
+
+# Koordinat önbelleğini MGM istasyon koordinatlarıyla doldur
+cache = GeocodeCache()
+cache.seed_from_stations()
+
+# Her (Şehir, İlçe) çifti yalnızca bir kez çözülür, geocoder sadece önbellekte olmayanlar için çağrılır
+pairs = df[["Şehir", "İlçe"]].drop_duplicates()
+coordinates = resolve_coordinates(pairs.itertuples(index=False, name=None), geolocator, cache)
+coords = pd.DataFrame(
+    [(sehir, ilce, lat, lon) for (sehir, ilce), (lat, lon) in coordinates.items()],
+    columns=["Şehir", "İlçe", "latitude", "longitude"]
+)
 
 # Enlem ve boylam sütunlarını ekle
-df["latitude"] = None
-df["longitude"] = None
-
-# Enlem ve boylamı almak için fonksiyon
-def get_lat_lon(sehir, ilce):
-    location = geolocator.geocode(f"{ilce}, {sehir}, Türkiye")
-    if location:
-        return location.latitude, location.longitude
-    return None, None
-
-# Tüm satırlar için enlem ve boylam bilgilerini doldur
-for index, row in df.iterrows():
-    sehir = row["Şehir"]
-    ilce = row["İlçe"]
-    lat, lon = get_lat_lon(sehir, ilce)
-    df.at[index, "latitude"] = lat
-    df.at[index, "longitude"] = lon
-    time.sleep(1)  # API taleplerini yavaşlatmak için
+df = df.merge(coords, on=["Şehir", "İlçe"], how="left")
 
 # Boş enlem-boylam verilerini çıkar
 df = df.dropna(subset=["latitude", "longitude"])
@@ -1,61 +1,219 @@
+import argparse
 import requests
 import warnings
 import pandas as pd
-import plotly.figure_factory as ff
 import numpy as np
 import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+import history_store
+from district_index import clear_tr_character, load_index
+from hexbin import (AGGREGATES, HEX_SIZE, LAYER_FILE, LAYER_SCRIPT_FILE, TEMPLATE_FILE, load_layer, write_layer,
+                    write_template)
+from metrics import METRICS, profile, serve
+from observation import OBSERVATION_COLUMNS, Observation, to_columns
+from station_cache import get_station_cache
 
 warnings.filterwarnings("ignore", message="Unverified HTTPS request")
 
+# Yerel bir stub sunucuya karşı çalıştırmak için MGM_BASE_URL ile değiştirilebilir
+BASE_URL = os.environ.get("MGM_BASE_URL", "https://servis.mgm.gov.tr").rstrip("/")
+
+HEADERS = {
+    "Connection": "keep-alive",
+    "Accept": "application/json, text/plain, */*",
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/81.0.4044.122 Safari/537.36",
+    "Origin": "https://www.mgm.gov.tr"
+}
+
+MAX_WORKERS = 8
+REQUESTS_PER_SECOND = 10.0
+MAX_RETRIES = 3
+BACKOFF_SECONDS = 0.5
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+CSV_FILE = 'weather_data.csv'
+MAX_AGE = 15 * 60  # Saniye cinsinden; bu süreden eski satırlar yeniden çekilir
+WEATHER_COLUMNS = ["Province", "District", "Latitude", "Longitude", "Elevation"] + OBSERVATION_COLUMNS + ["Status", "FetchedAt"]
+
+class TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        # DNS + TCP süresi; response_headers_seconds'tan çıkarılınca sunucu süresi kalır
+        with METRICS.timer("connect_seconds", scheme="http"):
+            super().connect()
+        METRICS.inc("connections_total", scheme="http")
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        # DNS + TCP + TLS el sıkışması
+        with METRICS.timer("connect_seconds", scheme="https"):
+            super().connect()
+        METRICS.inc("connections_total", scheme="https")
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    # Yeni açılan her bağlantı sayılır; keep-alive çalışıyorsa connections_total havuz boyutunu aşmaz
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+
+_session = None
+_pool_size = 0
+_session_lock = threading.Lock()
+
+
+def get_session(pool_size=None):
+    global _session, _pool_size
+    pool_size = pool_size or MAX_WORKERS
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers.update(HEADERS)
+            _session.verify = False
+        if pool_size > _pool_size:
+            # Havuz, kullanılan iş parçacığı sayısından küçükse bağlantılar atılır ve keep-alive kaybolur
+            adapter = TimedHTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+            _pool_size = pool_size
+        return _session
+
+
+class RateLimiter:
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time)
+            self.next_time = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+_limiter = RateLimiter(REQUESTS_PER_SECOND)
+
+
+def fetch_json(url, retries=None, backoff=None, limiter=None):
+    # Varsayılanlar çağrı anında okunur; testler ve benchmark modül sabitlerini değiştirebilir
+    retries = MAX_RETRIES if retries is None else retries
+    backoff = BACKOFF_SECONDS if backoff is None else backoff
+    session = get_session()
+    limiter = limiter or _limiter
+    endpoint = urlparse(url).path.rsplit("/", 1)[-1]
+    for attempt in range(retries + 1):
+        with METRICS.timer("rate_limit_wait_seconds"):
+            limiter.wait()
+        METRICS.inc("requests_total", endpoint=endpoint)
+        try:
+            with METRICS.timer("request_seconds", endpoint=endpoint):
+                response = session.get(url, timeout=10)
+            # elapsed: bağlantı kurulumu dahil, yanıt başlıkları gelene kadar geçen süre
+            METRICS.observe("response_headers_seconds", response.elapsed.total_seconds(), endpoint=endpoint)
+            METRICS.inc("responses_total", endpoint=endpoint, status=response.status_code)
+            METRICS.inc("response_bytes_total", len(response.content), endpoint=endpoint)
+            if response.status_code not in RETRY_STATUS:
+                response.raise_for_status()
+                with METRICS.timer("json_parse_seconds", endpoint=endpoint):
+                    data = response.json()
+                if not data:
+                    METRICS.inc("empty_responses_total", endpoint=endpoint)
+                return data
+            retry_after = response.headers.get("Retry-After")
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else backoff * 2 ** attempt
+            error = requests.HTTPError(f"HTTP {response.status_code} for {url}", response=response)
+        except (requests.ConnectionError, requests.Timeout) as exc:
+            METRICS.inc("request_errors_total", endpoint=endpoint, error=type(exc).__name__)
+            delay = backoff * 2 ** attempt
+            error = exc
+        if attempt < retries:
+            METRICS.inc("retries_total", endpoint=endpoint)
+            time.sleep(delay + random.uniform(0, backoff))
+    METRICS.inc("failed_requests_total", endpoint=endpoint)
+    raise error
+
 class MGMWeather:
-    def __init__(self, location):
+    def __init__(self, location, station_cache=None):
+        self.station_cache = station_cache if station_cache is not None else get_station_cache()
         self.location = self.clear_tr_character(location)
         self.location_id = None
         self.latitude = None
         self.longitude = None
+        self.elevation = None
         self.current_degree = None
+        self.observation = None
         self.district_name = None
         self.target_location_details = None
 
-    def clear_tr_character(self, city_name):
-        replacements = {
-            "ı": "i", "ü": "u", "ğ": "g", "ş": "s", "ö": "o", "ç": "c"
-        }
-        for tr_char, lat_char in replacements.items():
-            city_name = city_name.replace(tr_char, lat_char)
-        return city_name.lower()
+    @staticmethod
+    def clear_tr_character(city_name):
+        return clear_tr_character(city_name)
 
     def request(self, url):
-        headers = {
-            "Host": "servis.mgm.gov.tr",
-            "Connection": "keep-alive",
-            "Accept": "application/json, text/plain, */*",
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/81.0.4044.122 Safari/537.36",
-            "Origin": "https://www.mgm.gov.tr"
-        }
-        response = requests.get(url, headers=headers, verify=False)
-        return response.json()
+        return fetch_json(url)
+
+    def get_station(self, district_name=None):
+        station = self.station_cache.get(self.location, district_name)
+        METRICS.inc("station_cache_total", result="miss" if station is None else "hit")
+        if station is not None:
+            return station
+
+        station_url = f"{BASE_URL}/web/merkezler?il={self.location}"
+        if district_name:
+            station_url += f"&ilce={district_name}"
+        station_data = self.request(station_url)
+
+        if not isinstance(station_data, list) or len(station_data) == 0:
+            return None
+
+        self.station_cache.put(self.location, district_name, station_data[0])
+        return station_data[0]
 
     def fetch_data(self):
-        city_data_url = f"https://servis.mgm.gov.tr/web/merkezler?il={self.location}"
-        city_data = self.request(city_data_url)
+        station = self.get_station()
 
-        if not isinstance(city_data, list) or len(city_data) == 0:
+        if station is None:
             print(f"No data found for {self.location}")
             return
 
-        self.location_id = city_data[0].get("merkezId")
-        self.longitude = city_data[0].get("boylam")
-        self.latitude = city_data[0].get("enlem")
+        self.location_id = station.get("merkezId")
+        self.longitude = station.get("boylam")
+        self.latitude = station.get("enlem")
+        self.elevation = station.get("yukseklik")
 
-        city_current_weather_url = f"https://servis.mgm.gov.tr/web/sondurumlar?merkezid={self.location_id}"
+        city_current_weather_url = f"{BASE_URL}/web/sondurumlar?merkezid={self.location_id}"
         city_current_weather = self.request(city_current_weather_url)
 
         if not isinstance(city_current_weather, list) or len(city_current_weather) == 0:
             print(f"No weather data found for {self.location}")
             return
 
-        self.current_degree = city_current_weather[0].get("sicaklik")
+        self.observation = Observation.from_record(city_current_weather[0])
+        self.current_degree = self.observation.sicaklik
 
     def get_current_temperature(self):
         self.fetch_data()
@@ -72,17 +230,17 @@ class MGMWeather:
             print("No district name provided.")
             return
         
-        district_data_url = f"https://servis.mgm.gov.tr/web/merkezler?il={self.location}&ilce={self.district_name}"
-        district_data = self.request(district_data_url)
+        station = self.get_station(self.district_name)
 
-        if not isinstance(district_data, list) or len(district_data) == 0:
+        if station is None:
             print(f"No district data found for {self.district_name} in {self.location}")
             return
 
-        self.target_location_details = district_data[0]
+        self.target_location_details = station
         self.location_id = self.target_location_details.get("merkezId")
         self.longitude = self.target_location_details.get("boylam")
         self.latitude = self.target_location_details.get("enlem")
+        self.elevation = self.target_location_details.get("yukseklik")
         self.fetch_district_weather_data()
 
     def fetch_district_weather_data(self):
@@ -90,93 +248,192 @@ class MGMWeather:
             print("No location ID found.")
             return
         
-        district_weather_url = f"https://servis.mgm.gov.tr/web/sondurumlar?merkezid={self.location_id}"
+        district_weather_url = f"{BASE_URL}/web/sondurumlar?merkezid={self.location_id}"
         district_weather = self.request(district_weather_url)
 
         if not isinstance(district_weather, list) or len(district_weather) == 0:
             print(f"No weather data found for district {self.district_name} in {self.location}")
             return
         
-        self.current_degree = district_weather[0].get("sicaklik")
+        self.observation = Observation.from_record(district_weather[0])
+        self.current_degree = self.observation.sicaklik
         print(f"Current Temperature in {self.location} - {self.district_name}: {self.current_degree} °C")
 
 def get_all_provinces():
-    return {
-        "adana": [
-            "aladağ",
-            "ceyhan",
-            "çukurova",
-            "imamoglu",
-            "feke",
-            "karaisali",
-            "karataş",
-            "kozan",
-            "pozantı",
-            "saimbeyli",
-            "sarıçam",
-            "seyhan",
-            "tufanbeyli",
-            "Adana Havalimanı",
-            "yumurtalık",
-            "yüreğir"
-        ]
-        # Diğer iller ve ilçeler
-    }
-
-def fetch_all_weather_data():
-    csv_file = 'weather_data.csv'
-    
-    if os.path.exists(csv_file):
-        df = pd.read_csv(csv_file)
-        print("CSV dosyasından veri okundu.")
-    else:
-        provinces = get_all_provinces()
-        weather_data = []
-
-        for province, districts in provinces.items():
-            weather = MGMWeather(province)
-            for district in districts:
-                weather.district(district)
-                if weather.current_degree is not None:
-                    weather_data.append({
-                        "Province": province.title(),
-                        "District": district.title(),
-                        "Latitude": weather.latitude,
-                        "Longitude": weather.longitude,
-                        "Temperature": weather.current_degree
-                    })
-
-        df = pd.DataFrame(weather_data)
-        df.to_csv(csv_file, index=False)
-        print("Veriler API'den çekildi ve CSV dosyasına yazıldı.")
-    
+    # ilceler.py'deki tablo tekilleştirilmiş indeks üzerinden okunur
+    return load_index().as_dict()
+
+def fetch_one(province, district):
+    fetched_at = time.time()
+    weather = MGMWeather(province)
+    try:
+        weather.district(district)
+    except (requests.RequestException, ValueError) as exc:
+        print(f"Request failed for {province} - {district}: {exc}")
+        return province, district, None, None, None, None, "error", fetched_at
+    status = "ok" if weather.observation is not None else "empty"
+    return (province, district, weather.latitude, weather.longitude, weather.elevation,
+            weather.observation, status, fetched_at)
+
+def fetch_many(pairs, max_workers=MAX_WORKERS):
+    pairs = list(pairs)
+    get_session(max_workers)
+    with METRICS.stage("fetch"), ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(lambda pair: fetch_one(*pair), pairs))
+
+    with METRICS.stage("dataframe"):
+        # Sonuçlar satır sözlükleri yerine sütun dizilerine dönüştürülür
+        provinces, districts, latitudes, longitudes, elevations, observations, statuses, fetched_at = (
+            zip(*results) if results else ([],) * 8
+        )
+        for status in statuses:
+            METRICS.inc("districts_total", status=status)
+        index = load_index()
+        labels = [index.label(p, d) for p, d in zip(provinces, districts)]
+        columns = {
+            "Province": [p for p, _ in labels],
+            "District": [d for _, d in labels],
+            "Latitude": np.array(latitudes, dtype=np.float64),
+            "Longitude": np.array(longitudes, dtype=np.float64),
+            # İstasyon yüksekliği (m); interpolation.idw'nin yükseklik düzeltmesinde kullanılır
+            "Elevation": np.array(elevations, dtype=np.float64),
+            **to_columns(observations),
+            "Status": list(statuses),
+            "FetchedAt": np.array(fetched_at, dtype=np.float64),
+        }
+        return pd.DataFrame(columns, columns=WEATHER_COLUMNS)
+
+def write_csv_atomic(df, csv_file):
+    tmp_file = f"{csv_file}.tmp"
+    df.to_csv(tmp_file, index=False)
+    os.replace(tmp_file, csv_file)
+
+def load_weather_csv(csv_file=CSV_FILE):
+    if not os.path.exists(csv_file):
+        return pd.DataFrame(columns=WEATHER_COLUMNS)
+    df = pd.read_csv(csv_file)
+    if not (set(WEATHER_COLUMNS) - {"Elevation"}).issubset(df.columns):
+        # Zaman damgası olmayan eski biçimdeki dosya: tüm satırlar bayat sayılır
+        return pd.DataFrame(columns=WEATHER_COLUMNS)
+    if "Elevation" not in df.columns:
+        # Yükseklik sütunu sonradan eklendi; eski dosyalarda ilçe yeniden çekilene kadar boş kalır
+        df.insert(df.columns.get_loc("Longitude") + 1, "Elevation", np.nan)
+    return df
+
+def keep_previous_values(updated, cached):
+    # Yeniden çekilemeyen ilçelerde son başarılı ölçüm korunur, yalnızca Status/FetchedAt güncellenir
+    failed = (updated["Status"] != "ok").to_numpy()
+    if not failed.any() or cached.empty:
+        return updated
+
+    value_columns = ["Latitude", "Longitude", "Elevation"] + OBSERVATION_COLUMNS
+    previous = cached[cached[value_columns].notna().any(axis=1)]
+    previous = previous.set_index([previous["Province"].map(clear_tr_character), previous["District"].map(clear_tr_character)])
+    previous = previous[~previous.index.duplicated(keep="last")]
+    keys = pd.MultiIndex.from_arrays([updated["Province"].map(clear_tr_character), updated["District"].map(clear_tr_character)])
+    carry = failed & keys.isin(previous.index)
+    if not carry.any():
+        return updated
+
+    updated = updated.copy()
+    source = previous.loc[keys[carry]]
+    for column in value_columns:
+        if pd.api.types.is_numeric_dtype(updated[column]):
+            values = updated[column].to_numpy(copy=True)
+            values[carry] = pd.to_numeric(source[column], errors="coerce").to_numpy()
+        else:
+            values = updated[column].astype(object).to_numpy(copy=True)
+            values[carry] = source[column].to_numpy()
+        updated[column] = values
+    return updated
+
+def fetch_all_weather_data(csv_file=CSV_FILE, max_age=MAX_AGE):
+    provinces = get_all_provinces()
+    pairs = [(province, district) for province, districts in provinces.items() for district in districts]
+
+    with METRICS.stage("csv_read"):
+        cached = load_weather_csv(csv_file)
+    # Hatalı satırlar her seferinde, diğerleri yalnızca max_age geçince yeniden çekilir
+    fresh = cached[(cached["Status"] != "error") & (time.time() - cached["FetchedAt"] <= max_age)]
+    # Eşleştirme normalize anahtarla yapılır; eski ASCII başlıklı satırlar da tanınır
+    fresh_keys = set(zip(fresh["Province"].map(clear_tr_character), fresh["District"].map(clear_tr_character)))
+    stale_pairs = [(p, d) for p, d in pairs if (p, d) not in fresh_keys]
+
+    if not stale_pairs:
+        print("CSV dosyasındaki veriler güncel, API'ye istek atılmadı.")
+        return cached
+
+    updated = fetch_many(stale_pairs)
+    df = keep_previous_values(updated, cached)
+    df = pd.concat([fresh, df], ignore_index=True) if len(fresh) else df
+    with METRICS.stage("csv_write"):
+        write_csv_atomic(df, csv_file)
+    with METRICS.stage("history_write"):
+        history_store.append(updated)
+    with METRICS.stage("history_compact"):
+        # Gün bittiğinde o günün parçaları tek dosyada birleştirilir; yapılacak iş yoksa yalnızca dizin listelenir
+        history_store.compact()
+    print(f"{len(stale_pairs)} satır API'den güncellendi ve CSV dosyasına yazıldı.")
+
     return df
 
-def plot_temperature_on_map(df):
-    df_filtered = df[df['Temperature'] != -9999]
-
-    fig = ff.create_hexbin_mapbox(
-        data_frame=df_filtered, 
-        lat="Latitude", 
-        lon="Longitude", 
-        color="Temperature", 
-        nx_hexagon=5,  # Altıgen boyutlarını büyütmek için daha küçük bir değer
-        opacity=0.6,
-        labels={"Temperature": "Temperature (°C)"},
-        color_continuous_scale="YlOrRd",
-        show_original_data=True
-    )
-
-    fig.update_layout(
-        mapbox_style="carto-positron",
-        mapbox_zoom=5,
-        mapbox_center={"lat": np.mean(df_filtered['Latitude']), "lon": np.mean(df_filtered['Longitude'])},
-        margin={"r":0,"t":0,"l":0,"b":0}
-    )
-
-    fig.write_html("map.html")
-    print("map.html dosyası oluşturuldu.")
+def plot_temperature_on_map(df=None, at=None, column="Temperature", size=HEX_SIZE, aggregates=AGGREGATES):
+    if df is None:
+        # Veri verilmezse geçmiş deposundan istenen ana ait son gözlemler okunur
+        df = history_store.latest_snapshot(at)
+    df_filtered = df.dropna(subset=["Latitude", "Longitude", column])
+    df_filtered = df_filtered[df_filtered[column] != -9999]
+    if df_filtered.empty:
+        # Boş veriyle katman temizlenmez; harita merkezi de hesaplanamaz (NaN geçersiz JSON olur)
+        print(f"{column} için geçerli gözlem yok, {LAYER_FILE} değiştirilmedi.")
+        return None
+
+    # Önceki katman yüklenir, yalnızca girdisi değişen altıgenler yeniden hesaplanır
+    with METRICS.stage("hex_aggregate"):
+        layer = load_layer(LAYER_FILE, size, aggregates)
+        layer.update(df_filtered["Latitude"], df_filtered["Longitude"], df_filtered[column])
+
+    if layer.changed or not os.path.exists(LAYER_FILE) or not os.path.exists(LAYER_SCRIPT_FILE):
+        with METRICS.stage("layer_write"):
+            write_layer(
+                layer,
+                LAYER_FILE,
+                label=column,
+                center={"lat": float(np.mean(df_filtered['Latitude'])), "lon": float(np.mean(df_filtered['Longitude']))}
+            )
+        print(f"{LAYER_FILE} güncellendi ({len(layer.changed)} altıgen değişti).")
+    else:
+        print(f"{LAYER_FILE} güncel, değişen altıgen yok.")
+
+    with METRICS.stage("html_write"):
+        template_written = write_template(TEMPLATE_FILE)
+    if template_written:
+        print(f"{TEMPLATE_FILE} dosyası oluşturuldu (doğrudan açılabilir veya read_api ile / adresinden sunulur).")
+    return layer
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="MGM ilçe sıcaklıklarını çekip haritaya dök")
+    parser.add_argument("--metrics-port", type=int, help="Prometheus metriklerini bu portta yayınla")
+    parser.add_argument("--metrics-json", help="çalışma sonunda metrikleri bu JSON dosyasına yaz")
+    parser.add_argument("--profile", nargs="?", const="", help="cProfile ile çalıştır; isteğe bağlı .prof dosyası")
+    args = parser.parse_args(argv)
+
+    if args.metrics_port:
+        serve(args.metrics_port)
+
+    def run():
+        df_weather = fetch_all_weather_data()
+        plot_temperature_on_map(df_weather)
+
+    if args.profile is not None:
+        with profile(args.profile or None):
+            run()
+    else:
+        run()
+
+    if args.metrics_json:
+        with open(args.metrics_json, "w", encoding="utf-8") as f:
+            f.write(METRICS.to_json())
 
 if __name__ == "__main__":
-    df_weather = fetch_all_weather_data()
-    plot_temperature_on_map(df_weather)
+    main()
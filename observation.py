@@ -0,0 +1,102 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+MISSING = -9999  # MGM eksik ölçümleri bu değerle döndürür
+
+# (sondurumlar anahtarı, Observation alanı, tablo sütunu); sütunu None olanlar tabloya alınmaz
+FIELDS = (
+    ("istNo", "ist_no", "StationId"),
+    ("veriZamani", "veri_zamani", "ObservedAt"),
+    ("sicaklik", "sicaklik", "Temperature"),
+    ("hissedilenSicaklik", "hissedilen_sicaklik", "FeelsLike"),
+    ("nem", "nem", "Humidity"),
+    ("ruzgarHiz", "ruzgar_hiz", "WindSpeed"),
+    ("ruzgarYon", "ruzgar_yon", "WindDirection"),
+    ("aktuelBasinc", "aktuel_basinc", "Pressure"),
+    ("denizeIndirgenmisBasinc", "denize_indirgenmis_basinc", "SeaLevelPressure"),
+    ("gorus", "gorus", "Visibility"),
+    ("kapalilik", "kapalilik", "CloudCover"),
+    ("hadiseKodu", "hadise_kodu", "Condition"),
+    ("yagis00Now", "yagis_00_now", "PrecipitationToday"),
+    ("yagis1Saat", "yagis_1_saat", "Precipitation1h"),
+    ("yagis6Saat", "yagis_6_saat", "Precipitation6h"),
+    ("yagis12Saat", "yagis_12_saat", "Precipitation12h"),
+    ("yagis24Saat", "yagis_24_saat", "Precipitation24h"),
+    ("karYukseklik", "kar_yukseklik", "SnowDepth"),
+    ("denizSicaklik", "deniz_sicaklik", "SeaTemperature"),
+    ("denizVeriZamani", "deniz_veri_zamani", None),
+    ("rasatMetar", "rasat_metar", None),
+    ("rasatSinoptik", "rasat_sinoptik", None),
+    ("rasatTaf", "rasat_taf", None),
+)
+
+INT_COLUMNS = {"StationId"}
+TIME_COLUMNS = {"ObservedAt"}
+CATEGORY_COLUMNS = {"Condition"}
+OBSERVATION_COLUMNS = [column for _, _, column in FIELDS if column is not None]
+FLOAT_COLUMNS = [
+    column for column in OBSERVATION_COLUMNS
+    if column not in INT_COLUMNS | TIME_COLUMNS | CATEGORY_COLUMNS
+]
+
+
+@dataclass(slots=True, frozen=True)
+class Observation:
+    ist_no: int = None
+    veri_zamani: str = None
+    sicaklik: float = None
+    hissedilen_sicaklik: float = None
+    nem: float = None
+    ruzgar_hiz: float = None
+    ruzgar_yon: float = None
+    aktuel_basinc: float = None
+    denize_indirgenmis_basinc: float = None
+    gorus: float = None
+    kapalilik: float = None
+    hadise_kodu: str = None
+    yagis_00_now: float = None
+    yagis_1_saat: float = None
+    yagis_6_saat: float = None
+    yagis_12_saat: float = None
+    yagis_24_saat: float = None
+    kar_yukseklik: float = None
+    deniz_sicaklik: float = None
+    deniz_veri_zamani: str = None
+    rasat_metar: str = None
+    rasat_sinoptik: str = None
+    rasat_taf: str = None
+
+    @classmethod
+    def from_record(cls, record):
+        values = {}
+        for key, attr, _ in FIELDS:
+            value = record.get(key)
+            if value == MISSING or value == str(MISSING):
+                value = None
+            values[attr] = value
+        return cls(**values)
+
+
+def to_columns(observations):
+    observations = list(observations)
+    n = len(observations)
+    columns = {}
+    for _, attr, column in FIELDS:
+        if column is None:
+            continue
+        values = [getattr(o, attr) if o is not None else None for o in observations]
+        if column in INT_COLUMNS:
+            columns[column] = np.fromiter((-1 if v is None else v for v in values), dtype=np.int32, count=n)
+        elif column in TIME_COLUMNS:
+            columns[column] = pd.to_datetime(values, utc=True, errors="coerce").as_unit("s")
+        elif column in CATEGORY_COLUMNS:
+            columns[column] = pd.Categorical(values)
+        else:
+            columns[column] = np.fromiter((np.nan if v is None else v for v in values), dtype=np.float32, count=n)
+    return columns
+
+
+def to_frame(observations):
+    return pd.DataFrame(to_columns(observations))
@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+CHUNK_SIZE = 100_000
+
+TR_MONTHS = {
+    "ocak": 1, "şubat": 2, "mart": 3, "nisan": 4, "mayıs": 5, "haziran": 6,
+    "temmuz": 7, "ağustos": 8, "eylül": 9, "ekim": 10, "kasım": 11, "aralık": 12,
+}
+
+# Rüzgarın estiği yön (meteorolojik açı, kuzeyden saat yönünde)
+WIND_DIRECTIONS = {
+    "Kuzeyden": 0.0, "Kuzeydoğudan": 45.0, "Doğudan": 90.0, "Güneydoğudan": 135.0,
+    "Güneyden": 180.0, "Güneybatıdan": 225.0, "Batıdan": 270.0, "Kuzeybatıdan": 315.0,
+}
+WIND_DIRECTION_TYPE = pd.CategoricalDtype(list(WIND_DIRECTIONS))
+_WIND_ANGLES = np.radians(np.array(list(WIND_DIRECTIONS.values()), dtype=np.float32))
+
+READ_DTYPES = {
+    "Liman Adı": "category",
+    "Tarih": "string",
+    "Şehir": "category",
+    "İlçe": "category",
+    "Saat": "string",  # "10.06" saat.dakika; float olarak okunursa "10.10" bozulur
+    "Sıcaklık": np.float32,
+    "Rüzgar": np.float32,
+    "Rüzgar yönü": WIND_DIRECTION_TYPE,
+    "Basınç": np.float32,
+    "Nem": np.float32,
+}
+MEASUREMENTS = ["Sıcaklık", "Rüzgar", "Basınç", "Nem", "u", "v"]
+
+
+def parse_timestamps(tarih, saat, year, previous_month=None):
+    # Tarihlerde yıl yoktur: year ilk satırın yılıdır, ay geriye gittiğinde (Aralık -> Ocak) yıl bir artar
+    day_month = tarih.str.strip().str.split(n=1, expand=True)
+    hour_minute = saat.str.strip().str.split(".", n=1, expand=True)
+    months = day_month[1].str.lower().map(TR_MONTHS).astype(np.float64)
+    known = months.ffill().to_numpy()
+    previous = np.concatenate(([np.nan if previous_month is None else previous_month], known[:-1]))
+    years = year + np.cumsum(known < previous)
+    last_month = known[-1] if len(known) and not np.isnan(known[-1]) else previous_month
+    timestamps = pd.to_datetime(pd.DataFrame({
+        "year": years,
+        "month": months,
+        "day": pd.to_numeric(day_month[0], errors="coerce"),
+        "hour": pd.to_numeric(hour_minute[0], errors="coerce"),
+        "minute": pd.to_numeric(hour_minute[1], errors="coerce") if hour_minute.shape[1] > 1 else 0,
+    }), errors="coerce")
+    return timestamps, int(years[-1]) if len(years) else year, last_month
+
+
+def wind_components(speed, direction):
+    # Rüzgar "-dan" estiği için vektör ters yöndedir: u doğuya, v kuzeye doğru bileşen
+    codes = direction.cat.codes.to_numpy()
+    angles = np.where(codes >= 0, _WIND_ANGLES[codes], np.nan).astype(np.float32)
+    speed = speed.to_numpy(dtype=np.float32)
+    return -speed * np.sin(angles), -speed * np.cos(angles)
+
+
+def read_chunks(path, year, chunksize=CHUNK_SIZE):
+    if year is None:
+        raise ValueError("Arşiv tarihleri yıl içermediği için year verilmelidir")
+    last_month = None
+    for chunk in pd.read_csv(path, dtype=READ_DTYPES, chunksize=chunksize):
+        # Yıl geçişi parçalar arasında da izlenir
+        chunk["Zaman"], year, last_month = parse_timestamps(chunk["Tarih"], chunk["Saat"], year, last_month)
+        chunk["u"], chunk["v"] = wind_components(chunk["Rüzgar"], chunk["Rüzgar yönü"])
+        yield chunk.drop(columns=["Tarih", "Saat"])
+
+
+def read_ports(path, year, chunksize=CHUNK_SIZE):
+    frames = list(read_chunks(path, year, chunksize))
+    if not frames:
+        return pd.DataFrame(columns=list(READ_DTYPES))
+    # Parçalardaki kategori listeleri farklı olabilir, birleştirirken korunmaları için birleşim alınır
+    for column in ("Liman Adı", "Şehir", "İlçe"):
+        categories = pd.api.types.union_categoricals([f[column] for f in frames]).categories
+        for f in frames:
+            f[column] = f[column].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+
+class PortAggregator:
+    def __init__(self, by=("Liman Adı",), freq=None):
+        self.by = list(by)
+        self.freq = freq
+        self.stats = None
+
+    def update(self, chunk):
+        keys = [chunk[column].astype(str) for column in self.by]
+        if self.freq:
+            keys.append(chunk["Zaman"].dt.floor(self.freq).rename("Zaman"))
+        values = chunk[MEASUREMENTS].astype(np.float64)
+        grouped = values.groupby(keys, observed=True, sort=False)
+        # Yalnızca toplanabilir istatistikler tutulur, böylece bellek grup sayısıyla sınırlı kalır
+        partial = pd.concat({
+            "count": grouped.count(),
+            "sum": grouped.sum(),
+            "min": grouped.min(),
+            "max": grouped.max(),
+        }, axis=1)
+        if self.stats is None:
+            self.stats = partial
+            return self
+        combined = self.stats.reindex(self.stats.index.union(partial.index))
+        partial = partial.reindex(combined.index)
+        for stat in ("count", "sum"):
+            combined[stat] = combined[stat].fillna(0) + partial[stat].fillna(0)
+        combined["min"] = np.fmin(combined["min"], partial["min"])
+        combined["max"] = np.fmax(combined["max"], partial["max"])
+        self.stats = combined
+        return self
+
+    def result(self):
+        if self.stats is None:
+            return pd.DataFrame()
+        counts = self.stats["count"]
+        means = self.stats["sum"] / counts.where(counts > 0)
+        out = pd.concat({"mean": means, "min": self.stats["min"], "max": self.stats["max"], "count": counts}, axis=1)
+        out.columns = [f"{column}_{stat}" for stat, column in out.columns]
+        # Ortalama rüzgar vektöründen hız ve estiği yön
+        out["Rüzgar_vektör_hız"] = np.hypot(out["u_mean"], out["v_mean"])
+        out["Rüzgar_vektör_yön"] = np.degrees(np.arctan2(-out["u_mean"], -out["v_mean"])) % 360
+        return out.astype(np.float32)
+
+
+def aggregate_archive(path, year, by=("Liman Adı",), freq=None, chunksize=CHUNK_SIZE):
+    aggregator = PortAggregator(by, freq)
+    for chunk in read_chunks(path, year, chunksize):
+        aggregator.update(chunk)
+    return aggregator.result()
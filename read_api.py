@@ -0,0 +1,251 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import mgm_ilce
+from hexbin import LAYER_FILE, render_template
+from metrics import METRICS
+from observation import Observation
+
+OBSERVATION_TTL = 5 * 60  # MGM son durumları yaklaşık 10 dakikada bir yenilenir
+STATION_TTL = 24 * 3600
+MISSING_TTL = 30  # Bilinmeyen ilçe / boş sondurumlar yanıtları kısa süre önbellekte tutulur
+MISSING = object()
+CACHE_SIZE = 2048
+MAX_BATCH = 500
+POOL_SIZE = 64  # Eşzamanlı istek işleyen iş parçacıkları için upstream bağlantı havuzu
+
+
+class TTLCache:
+    def __init__(self, maxsize=CACHE_SIZE, ttl=OBSERVATION_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.items = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self.items[key]
+                return None
+            self.items.move_to_end(key)
+            return value
+
+    def put(self, key, value, ttl=None):
+        with self.lock:
+            self.items[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class SingleFlight:
+    # Aynı anahtar için eşzamanlı çağrılar tek bir upstream isteğinde birleştirilir
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, func):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = {"event": threading.Event(), "result": None, "error": None}
+        if not leader:
+            METRICS.inc("read_api_coalesced_total")
+            call["event"].wait()
+        else:
+            try:
+                call["result"] = func()
+            except Exception as exc:
+                call["error"] = exc
+            finally:
+                with self.lock:
+                    del self.calls[key]
+                call["event"].set()
+        if call["error"] is not None:
+            raise call["error"]
+        return call["result"]
+
+
+class WeatherService:
+    def __init__(self, cache_size=CACHE_SIZE, ttl=OBSERVATION_TTL, station_ttl=STATION_TTL, missing_ttl=MISSING_TTL):
+        self.observations = TTLCache(cache_size, ttl)
+        self.stations = TTLCache(cache_size, station_ttl)
+        self.missing_ttl = missing_ttl
+        self.flight = SingleFlight()
+        self.layer = None
+        self.layer_mtime = None
+
+    def _cached(self, cache, key, func):
+        value = cache.get(key)
+        if value is not None:
+            METRICS.inc("read_api_cache_total", cache=key[0], result="hit")
+            return None if value is MISSING else value
+        METRICS.inc("read_api_cache_total", cache=key[0], result="miss")
+
+        def load():
+            # Önceki lider önbelleği doldurup çıkmış olabilir; tekrar upstream'e gidilmez
+            value = cache.get(key)
+            if value is None:
+                value = func()
+                if value is None:
+                    cache.put(key, MISSING, self.missing_ttl)
+                else:
+                    cache.put(key, value)
+            return None if value is MISSING else value
+
+        return self.flight.do(key, load)
+
+    def station(self, il, ilce=None):
+        weather = mgm_ilce.MGMWeather(il)
+        district_name = weather.clear_tr_character(ilce) if ilce else None
+        return self._cached(
+            self.stations, ("station", weather.location, district_name or ""),
+            lambda: weather.get_station(district_name)
+        )
+
+    def observation(self, merkez_id):
+        def load():
+            data = mgm_ilce.fetch_json(f"{mgm_ilce.BASE_URL}/web/sondurumlar?merkezid={merkez_id}")
+            if not isinstance(data, list) or len(data) == 0:
+                return None
+            return Observation.from_record(data[0])
+
+        return self._cached(self.observations, ("observation", merkez_id), load)
+
+    def current(self, il, ilce=None):
+        station = self.station(il, ilce)
+        if station is None:
+            return None
+        observation = self.observation(station.get("merkezId"))
+        return {
+            "il": il,
+            "ilce": ilce,
+            "merkezId": station.get("merkezId"),
+            "enlem": station.get("enlem"),
+            "boylam": station.get("boylam"),
+            "yukseklik": station.get("yukseklik"),
+            "observation": asdict(observation) if observation is not None else None,
+        }
+
+    def batch(self, pairs, max_workers=mgm_ilce.MAX_WORKERS):
+        def one(pair):
+            try:
+                result = self.current(*pair)
+            except Exception as exc:
+                return {"il": pair[0], "ilce": pair[1], "error": str(exc)}
+            return result or {"il": pair[0], "ilce": pair[1], "error": "bulunamadı"}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(one, pairs))
+
+    def map_layer(self, path=LAYER_FILE):
+        # Katman dosyası yalnızca değiştiğinde yeniden okunur
+        if not os.path.exists(path):
+            return None
+        mtime = os.path.getmtime(path)
+        if self.layer is None or mtime != self.layer_mtime:
+            with open(path, "rb") as f:
+                self.layer = f.read()
+            self.layer_mtime = mtime
+        return self.layer
+
+
+def _parse_pairs(values):
+    pairs = []
+    for value in values:
+        il, _, ilce = value.partition("/")
+        pairs.append((il, ilce or None))
+    return pairs
+
+
+def make_server(port=8080, host="127.0.0.1", service=None):
+    service = service or WeatherService()
+    mgm_ilce.get_session(POOL_SIZE)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            params = parse_qs(parsed.query)
+            try:
+                if parsed.path == "/current":
+                    if "il" not in params:
+                        return self._json(400, {"error": "il parametresi gerekli"})
+                    result = service.current(params["il"][0], params.get("ilce", [None])[0])
+                    return self._json(404 if result is None else 200, result or {"error": "bulunamadı"})
+                if parsed.path == "/batch":
+                    return self._batch(_parse_pairs(params.get("d", [])))
+                if parsed.path in ("/", "/map.html"):
+                    # Aynı şablon, katmanı bu servisin /map adresinden alacak şekilde sunulur
+                    return self._send(200, render_template("/map").encode("utf-8"), "text/html")
+                if parsed.path == "/map":
+                    layer = service.map_layer()
+                    if layer is None:
+                        return self._json(404, {"error": "harita katmanı henüz oluşturulmadı"})
+                    return self._send(200, layer, "application/json")
+                if parsed.path == "/metrics":
+                    return self._send(200, METRICS.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+                self._json(404, {"error": "bilinmeyen adres"})
+            except Exception as exc:
+                self._json(502, {"error": str(exc)})
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/batch":
+                return self._json(404, {"error": "bilinmeyen adres"})
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"[]")
+                pairs = [(item["il"], item.get("ilce")) for item in body]
+            except (ValueError, KeyError, TypeError):
+                return self._json(400, {"error": 'gövde [{"il": ..., "ilce": ...}] biçiminde olmalı'})
+            self._batch(pairs)
+
+        def _batch(self, pairs):
+            if not pairs:
+                return self._json(400, {"error": "en az bir ilçe gerekli"})
+            if len(pairs) > MAX_BATCH:
+                return self._json(400, {"error": f"en fazla {MAX_BATCH} ilçe istenebilir"})
+            self._json(200, service.batch(pairs))
+
+        def _json(self, status, body):
+            self._send(status, json.dumps(body, ensure_ascii=False).encode("utf-8"), "application/json")
+
+        def _send(self, status, data, content_type):
+            self.send_response(status)
+            self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="MGM gözlemleri için yerel okuma API'si")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.host)
+    print(f"Okuma API'si http://{args.host}:{args.port} adresinde çalışıyor")
+    server.serve_forever()
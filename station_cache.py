@@ -0,0 +1,64 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+STATION_DB = os.environ.get("MGM_STATION_DB", "stations.db")
+STATION_TTL = 30 * 24 * 3600  # İstasyon bilgileri nadiren değişir, 30 gün yeterli
+
+
+class StationCache:
+    def __init__(self, path=STATION_DB, ttl=STATION_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS stations ("
+            "il TEXT NOT NULL, ilce TEXT NOT NULL, merkez_id INTEGER, "
+            "enlem REAL, boylam REAL, record TEXT, fetched_at REAL, "
+            "PRIMARY KEY (il, ilce))"
+        )
+        self.conn.commit()
+
+    def get(self, il, ilce=""):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT record, fetched_at FROM stations WHERE il = ? AND ilce = ?",
+                (il, ilce or "")
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(row[0])
+
+    def put(self, il, ilce, record):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO stations VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (il, ilce or "", record.get("merkezId"), record.get("enlem"),
+                 record.get("boylam"), json.dumps(record, ensure_ascii=False), time.time())
+            )
+            self.conn.commit()
+
+    def items(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT il, ilce, record FROM stations").fetchall()
+        return [(il, ilce, json.loads(record)) for il, ilce, record in rows]
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM stations")
+            self.conn.commit()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_station_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = StationCache()
+        return _cache
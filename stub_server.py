@@ -0,0 +1,187 @@
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import mgm_ilce
+from district_index import clear_tr_character, district_id, load_index
+
+
+def _fixture_key(path, query):
+    params = parse_qs(query)
+    if path.endswith("/merkezler"):
+        il = clear_tr_character(params.get("il", [""])[0])
+        ilce = clear_tr_character(params.get("ilce", [""])[0])
+        return f"merkezler/{il}/{ilce}"
+    if path.endswith("/sondurumlar"):
+        return f"sondurumlar/{params.get('merkezid', [''])[0]}"
+    return None
+
+
+def load_fixtures(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def record_fixtures(pairs, path, fetch=None):
+    # Gerçek servisten merkezler/sondurumlar yanıtlarını kaydeder
+    fetch = fetch or mgm_ilce.fetch_json
+    fixtures = {}
+    for il, ilce in pairs:
+        il, ilce = clear_tr_character(il), clear_tr_character(ilce)
+        stations = fetch(f"{mgm_ilce.BASE_URL}/web/merkezler?il={il}&ilce={ilce}")
+        fixtures[f"merkezler/{il}/{ilce}"] = stations
+        if isinstance(stations, list) and stations:
+            merkez_id = stations[0].get("merkezId")
+            fixtures[f"sondurumlar/{merkez_id}"] = fetch(f"{mgm_ilce.BASE_URL}/web/sondurumlar?merkezid={merkez_id}")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(fixtures, f, ensure_ascii=False)
+    return fixtures
+
+
+def synthetic_fixtures(pairs=None, seed=0):
+    # Kayıt yoksa ilçe indeksinden tutarlı, sahte istasyon ve gözlemler üretilir
+    rng = random.Random(seed)
+    pairs = pairs if pairs is not None else load_index().pairs()
+    fixtures = {}
+    for il, ilce in pairs:
+        merkez_id = district_id(il, ilce) % 90000 + 10000
+        lat = 36.0 + (zlib.crc32(il.encode()) % 600) / 100.0
+        lon = 26.0 + (zlib.crc32(ilce.encode()) % 1800) / 100.0
+        fixtures[f"merkezler/{il}/{ilce}"] = [{
+            "merkezId": merkez_id, "il": il.title(), "ilce": ilce.title(),
+            "enlem": lat, "boylam": lon, "yukseklik": rng.randint(0, 2000)
+        }]
+        fixtures[f"sondurumlar/{merkez_id}"] = [{
+            "istNo": merkez_id, "veriZamani": "2024-09-06T07:00:00.000Z",
+            "sicaklik": round(rng.uniform(5, 35), 1), "hissedilenSicaklik": round(rng.uniform(5, 35), 1),
+            "nem": rng.randint(20, 95), "ruzgarHiz": round(rng.uniform(0, 40), 1),
+            "ruzgarYon": rng.randint(0, 359), "aktuelBasinc": round(rng.uniform(850, 1020), 1),
+            "denizeIndirgenmisBasinc": round(rng.uniform(1000, 1025), 1), "gorus": 10000,
+            "kapalilik": rng.randint(0, 8), "hadiseKodu": rng.choice(["A", "AB", "PB", "Y"]),
+            "yagis00Now": 0.0, "yagis24Saat": -9999, "karYukseklik": -9999, "denizSicaklik": -9999,
+            "rasatMetar": "-9999", "rasatSinoptik": "-9999", "rasatTaf": "-9999"
+        }]
+    return fixtures
+
+
+class StubServer:
+    def __init__(self, fixtures=None, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit=None,
+                 host="127.0.0.1", port=0, seed=0):
+        self.fixtures = fixtures if fixtures is not None else synthetic_fixtures()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.tokens = float(rate_limit or 0)
+        self.last_refill = time.monotonic()
+        self.counts = {"requests": 0, "errors": 0, "throttled": 0, "not_found": 0}
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _take_token(self):
+        # Basit token bucket: saniyede rate_limit istek, aşılırsa 429
+        if not self.rate_limit:
+            return True
+        now = time.monotonic()
+        self.tokens = min(self.rate_limit, self.tokens + (now - self.last_refill) * self.rate_limit)
+        self.last_refill = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Başlık ve gövde ayrı yazıldığından Nagle + gecikmeli ACK keep-alive isteklerine ~40 ms ekler
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with stub.lock:
+                    stub.counts["requests"] += 1
+                    allowed = stub._take_token()
+                    failed = stub.random.random() < stub.error_rate
+                    delay = max(0.0, stub.latency + stub.random.uniform(-stub.jitter, stub.jitter))
+                if delay:
+                    time.sleep(delay)
+
+                if not allowed:
+                    with stub.lock:
+                        stub.counts["throttled"] += 1
+                    return self._send(429, b"", {"Retry-After": "1"})
+                if failed:
+                    with stub.lock:
+                        stub.counts["errors"] += 1
+                    return self._send(500, b"")
+
+                parsed = urlparse(self.path)
+                body = stub.fixtures.get(_fixture_key(parsed.path, parsed.query))
+                if body is None:
+                    with stub.lock:
+                        stub.counts["not_found"] += 1
+                    body = []
+                self._send(200, json.dumps(body, ensure_ascii=False).encode("utf-8"),
+                           {"Content-Type": "application/json; charset=utf-8"})
+
+            def _send(self, status, data, headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Yerel MGM servis taklidi")
+    parser.add_argument("--fixtures", help="record_fixtures ile kaydedilmiş JSON dosyası")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="saniye")
+    parser.add_argument("--jitter", type=float, default=0.0, help="saniye")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None, help="saniyede istek; aşılırsa 429")
+    args = parser.parse_args()
+
+    server = StubServer(
+        load_fixtures(args.fixtures) if args.fixtures else None,
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        rate_limit=args.rate_limit, port=args.port
+    )
+    print(f"Stub sunucu {server.url} adresinde çalışıyor (MGM_BASE_URL={server.url})")
+    server.server.serve_forever()
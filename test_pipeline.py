@@ -0,0 +1,144 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import history_store
+import interpolation
+import mgm_ilce
+import station_cache
+from district_index import load_index
+from hexbin import HexLayer
+from port_ingest import parse_timestamps
+from stub_server import StubServer, synthetic_fixtures
+
+PROVINCES = {province: districts[:4] for province, districts in list(load_index().as_dict().items())[:3]}
+PAIRS = [(province, district) for province, districts in PROVINCES.items() for district in districts]
+
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    # Stub sunucu hata ve 429 üretir; yeniden denemeler bekletmeden yapılır
+    server = StubServer(synthetic_fixtures(PAIRS), error_rate=0.2, rate_limit=20)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(mgm_ilce, "BASE_URL", server.url)
+    monkeypatch.setattr(mgm_ilce, "_limiter", mgm_ilce.RateLimiter(0))
+    monkeypatch.setattr(mgm_ilce, "MAX_RETRIES", 10)
+    monkeypatch.setattr(mgm_ilce, "BACKOFF_SECONDS", 0.01)
+    monkeypatch.setattr(mgm_ilce, "get_all_provinces", lambda: PROVINCES)
+    monkeypatch.setattr(station_cache, "_cache", station_cache.StationCache(str(tmp_path / "stations.db")))
+    with server:
+        yield server
+
+
+def test_fetch_many_retries_errors_and_throttling(stub):
+    df = mgm_ilce.fetch_many(PAIRS)
+
+    assert list(df.columns) == mgm_ilce.WEATHER_COLUMNS
+    assert len(df) == len(PAIRS)
+    assert (df["Status"] == "ok").all()
+    assert df["Temperature"].notna().all()
+    assert df["Elevation"].notna().all()
+    assert stub.counts["errors"] > 0
+    assert stub.counts["throttled"] > 0
+
+
+def test_incremental_refresh_keeps_previous_values(stub, monkeypatch):
+    first = mgm_ilce.fetch_all_weather_data()
+    assert (first["Status"] == "ok").all()
+
+    requests = stub.counts["requests"]
+    cached = mgm_ilce.fetch_all_weather_data()
+    assert stub.counts["requests"] == requests
+    assert len(cached) == len(first)
+
+    stub.error_rate = 1.0
+    monkeypatch.setattr(mgm_ilce, "MAX_RETRIES", 1)
+    refreshed = mgm_ilce.fetch_all_weather_data(max_age=0)
+    assert (refreshed["Status"] == "error").all()
+    first = first.sort_values(["Province", "District"], ignore_index=True)
+    refreshed = refreshed.sort_values(["Province", "District"], ignore_index=True)
+    for column in ["Latitude", "Longitude", "Elevation", "Temperature"]:
+        np.testing.assert_allclose(refreshed[column], first[column])
+
+
+def _snapshot(provinces, districts, temperatures, fetched_at):
+    return pd.DataFrame({
+        "Province": provinces,
+        "District": districts,
+        "Latitude": 41.0,
+        "Longitude": 29.0,
+        "Temperature": temperatures,
+        "Status": "ok",
+        "FetchedAt": fetched_at,
+    })
+
+
+def test_history_query_reads_old_and_new_parts(tmp_path):
+    root = str(tmp_path / "history")
+    day = pd.Timestamp("2024-01-01", tz="UTC")
+
+    # Normalize anahtar, StationId ve Elevation sütunlarından önce, ASCII adlarla yazılmış parça
+    old = history_store.compact_frame(_snapshot(["Istanbul"], ["Kadikoy"], [10.0], day.timestamp() + 60))
+    directory = os.path.join(root, "date=2024-01-01")
+    os.makedirs(directory)
+    old.drop(columns=history_store.NORMALIZED_COLUMNS).to_parquet(
+        os.path.join(directory, "part-1.parquet"), index=False
+    )
+    history_store.append(_snapshot(["İstanbul", "Ankara"], ["Kadıköy", "Çankaya"], [12.0, 8.0],
+                                   day.timestamp() + 120), root=root)
+
+    def kadikoy():
+        return history_store.query(province="istanbul", district="KADIKÖY", root=root)
+
+    before = kadikoy()
+    assert before["Temperature"].tolist() == [10.0, 12.0]
+    assert before["StationId"].tolist() == [-1, -1]
+    assert before["Elevation"].isna().all()
+
+    assert history_store.compact(root=root, before=day + pd.Timedelta(days=1)) == 1
+    assert len(history_store.partitions(root)) == 1
+    pd.testing.assert_frame_equal(kadikoy(), before)
+    assert history_store.query(district="cankaya", root=root)["Temperature"].tolist() == [8.0]
+    assert history_store.query(province="izmir", root=root).empty
+
+
+def test_hex_layer_update_reports_only_changed_cells():
+    lat = np.array([39.0, 39.01, 41.0, 37.0])
+    lon = np.array([32.0, 32.01, 29.0, 27.0])
+    values = np.array([10.0, 11.0, 20.0, 30.0])
+
+    layer = HexLayer().update(lat, lon, values)
+    assert len(layer.changed) == 3
+    assert layer.update(lat, lon, values).changed == []
+
+    values[2] = 21.0
+    assert len(layer.update(lat, lon, values).changed) == 1
+    assert len(layer.update(lat[:2], lon[:2], values[:2]).changed) == 2
+
+
+def test_idw_elevation_correction():
+    elevations = np.array([0.0, 500.0, 1500.0])
+    values = 20.0 - interpolation.LAPSE_RATE * elevations
+    grid_lat, grid_lon = np.array([[39.0]]), np.array([[35.0]])
+
+    surface = interpolation.idw([39.0, 39.1, 38.9], [35.0, 35.1, 34.9], values, grid_lat, grid_lon,
+                                elevations=elevations, grid_elevations=np.array([[1000.0]]))
+    np.testing.assert_allclose(surface, [[20.0 - interpolation.LAPSE_RATE * 1000.0]])
+    with pytest.raises(ValueError):
+        interpolation.idw([39.0], [35.0], [20.0], grid_lat, grid_lon, elevations=[0.0])
+
+
+def test_parse_timestamps_rolls_over_new_year():
+    timestamps, year, month = parse_timestamps(
+        pd.Series(["30 Aralık", "31 Aralık", "1 Ocak"]), pd.Series(["12.00", "23.00", "01.00"]), 2023
+    )
+    assert timestamps.tolist() == [pd.Timestamp("2023-12-30 12:00"), pd.Timestamp("2023-12-31 23:00"),
+                                   pd.Timestamp("2024-01-01 01:00")]
+    assert (year, month) == (2024, 1)
+
+    # Bir sonraki parça, önceki parçanın son ayından devam eder
+    timestamps, year, _ = parse_timestamps(pd.Series(["2 Ocak"]), pd.Series(["00.00"]), 2023, previous_month=12)
+    assert timestamps.tolist() == [pd.Timestamp("2024-01-02")]
+    assert year == 2024